@@ -2,23 +2,52 @@
 Flask-based REST API for Google Image Search
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, Response, stream_with_context
+from flask.json.provider import JSONProvider
 import os
 import json
+import hashlib
+import functools
+import glob
+import orjson
+from io import BytesIO
+from PIL import Image
 from dotenv import load_dotenv
-from image_search import GoogleImageAPI
+from image_search import GoogleImageAPI, SAVE_OPTIONS, to_columns
 import tempfile
 import shutil
+from gevent import monkey
 from werkzeug.utils import secure_filename
+import config
 
 # Load environment variables from .env file
 load_dotenv()
 
+
+class OrJSONProvider(JSONProvider):
+    """
+    JSON provider that serializes responses with orjson
+    """
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+        
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrJSONProvider(app)
 
 # Initialize the Google Image API
 google_api = GoogleImageAPI()
 
+# Build the search client now rather than during the first request
+try:
+    google_api.warm_up()
+except Exception as e:
+    print(f"Error warming up the search client: {str(e)}")
+
 @app.route('/', methods=['GET'])
 def home():
     """
@@ -50,6 +79,142 @@ def health_check():
 TEMP_DIR = os.path.join(tempfile.gettempdir(), 'google_images_search')
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Resized images handed to nginx; secure_filename() never yields a leading underscore
+RESIZED_DIR = os.path.join(TEMP_DIR, '_resized')
+
+# Size of the chunks relayed to the client when streaming an image
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Resized images larger than this many bytes are spooled to disk while being sent
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Number of seconds clients may reuse a downloaded image without revalidating
+CLIENT_CACHE_MAX_AGE = 86400
+
+# Starts a native OS thread, even in gevent workers where threads are otherwise greenlets
+_start_native_thread = monkey.get_original('_thread', 'start_new_thread')
+
+
+@functools.lru_cache(maxsize=1024)
+def _download_dir_for(query):
+    """
+    Get the download directory for a search query, GoogleImageAPI.search() creates it
+    """
+    return os.path.join(TEMP_DIR, secure_filename(query))
+
+
+def _image_cache_key(url):
+    """
+    Build the cache key for a downloaded image
+    """
+    return 'img:' + hashlib.sha1(url.encode()).hexdigest()
+
+
+def _get_cached_image(cache_key):
+    """
+    Get a cached image as a (content_type, content) tuple, or None on a miss
+    """
+    cached = google_api.get_cached(cache_key)
+    if cached is None:
+        return None
+    content_type, _, content = cached.partition(b'\n')
+    return content_type.decode(), content
+
+
+def _cache_image(cache_key, content_type, content):
+    """
+    Cache a downloaded image together with its content type
+    """
+    if len(content) <= config.IMAGE_CACHE_MAX_BYTES:
+        google_api.set_cached(cache_key, content_type.encode() + b'\n' + content, config.IMAGE_CACHE_TTL)
+
+
+def _relay_upstream(response, cache_key, content_type):
+    """
+    Yield the upstream image in chunks, caching it once fully received if it is small enough
+    """
+    content_length = response.headers.get('Content-Length')
+    received = bytearray() if google_api.cache is not None else None
+    if content_length and int(content_length) > config.IMAGE_CACHE_MAX_BYTES:
+        received = None
+        
+    try:
+        for chunk in response.iter_bytes(STREAM_CHUNK_SIZE):
+            if received is not None:
+                received += chunk
+                if len(received) > config.IMAGE_CACHE_MAX_BYTES:
+                    received = None
+            yield chunk
+    finally:
+        response.close()
+            
+    if received is not None:
+        _cache_image(cache_key, content_type, bytes(received))
+
+
+def _cacheable(response, etag):
+    """
+    Mark an image response as cacheable and revalidatable by the client
+    """
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CLIENT_CACHE_MAX_AGE
+    return response
+
+
+def _accel_redirect(path, etag):
+    """
+    Let nginx send a file from the temporary directory instead of streaming it through Python
+    """
+    image_format = Image.registered_extensions().get(os.path.splitext(path)[1])
+    response = Response(mimetype=Image.MIME.get(image_format, 'application/octet-stream'))
+    response.headers['X-Accel-Redirect'] = (
+        config.X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + os.path.relpath(path, TEMP_DIR).replace(os.sep, '/')
+    )
+    return _cacheable(response, etag)
+
+
+def _stream_upstream(url, etag):
+    """
+    Relay an image to the client as it arrives, without decoding it
+    """
+    # Serve repeat downloads of the same URL from the cache
+    cache_key = _image_cache_key(url)
+    cached = _get_cached_image(cache_key)
+    if cached is not None:
+        content_type, content = cached
+        return _cacheable(Response(content, mimetype=content_type), etag)
+        
+    response = google_api.session.send(google_api.session.build_request('GET', url, timeout=10), stream=True)
+    if response.status_code != 200:
+        response.close()
+        return jsonify({'error': 'Failed to download the image from URL'}), 500
+        
+    content_type = response.headers.get('Content-Type', 'application/octet-stream')
+    streamed = Response(
+        stream_with_context(_relay_upstream(response, cache_key, content_type)),
+        mimetype=content_type
+    )
+    streamed.call_on_close(response.close)
+    return _cacheable(streamed, etag)
+
+
+def _fetch_image(url):
+    """
+    Download an image into memory, returning its bytes or None if the download failed
+    """
+    cache_key = _image_cache_key(url)
+    cached = _get_cached_image(cache_key)
+    if cached is not None:
+        return cached[1]
+        
+    with google_api.session.stream('GET', url, timeout=10) as response:
+        if response.status_code != 200:
+            return None
+        content = response.read()
+        _cache_image(cache_key, response.headers.get('Content-Type', 'application/octet-stream'), content)
+    return content
+
 
 @app.route('/search', methods=['GET'])
 def search_images():
@@ -65,6 +230,8 @@ def search_images():
     - image_size: Image size (large, medium, etc.)
     - image_type: Image type (photo, clip-art, etc.)
     - download: Whether to download images (default: false)
+    - dimensions: Whether to fetch each image's width, height and file size (default: false)
+    - layout: 'rows' for a list of results, 'columns' for one list per field (default: rows)
     
     Returns:
         JSON object containing image results
@@ -82,12 +249,11 @@ def search_images():
         image_size = request.args.get('image_size')
         image_type = request.args.get('image_type')
         download = request.args.get('download', 'false').lower() == 'true'
+        include_dimensions = request.args.get('dimensions', 'false').lower() == 'true'
+        columns = request.args.get('layout', 'rows').lower() == 'columns'
         
         # Create a unique download directory if downloading is requested
-        download_dir = None
-        if download:
-            download_dir = os.path.join(TEMP_DIR, secure_filename(query))
-            os.makedirs(download_dir, exist_ok=True)
+        download_dir = _download_dir_for(query) if download else None
         
         # Search for images
         results = google_api.search(
@@ -98,14 +264,15 @@ def search_images():
             color_type=color_type,
             image_size=image_size,
             image_type=image_type,
-            download_directory=download_dir
+            download_directory=download_dir,
+            include_dimensions=include_dimensions
         )
         
         # Return results as JSON
         return jsonify({
             'query': query,
             'num_results': len(results),
-            'results': results
+            'results': to_columns(results) if columns else results
         })
         
     except Exception as e:
@@ -142,50 +309,78 @@ def download_image():
             
         maintain_aspect_ratio = request.args.get('maintain_aspect_ratio', 'true').lower() == 'true'
         
-        # Create a temporary directory
-        temp_dir = tempfile.mkdtemp(dir=TEMP_DIR)
-        
-        # Prepare the filename
-        filename = os.path.basename(url.split('?')[0])  # Remove query parameters
-        if not filename:
-            filename = 'image.jpg'
+        # Answer revalidation requests before fetching anything
+        etag = hashlib.sha1(f'{url}|{width}|{height}|{maintain_aspect_ratio}'.encode()).hexdigest()
+        if etag in request.if_none_match:
+            return _cacheable(Response(status=304), etag)
             
-        # Secure the filename
-        filename = secure_filename(filename)
-        filepath = os.path.join(temp_dir, filename)
-        
-        # Download the image directly
-        import requests
-        response = requests.get(url, stream=True, timeout=10)
-        if response.status_code != 200:
-            return jsonify({'error': 'Failed to download the image from URL'}), 500
+        # Images that are not resized never need to go through PIL
+        if not (width or height):
+            return _stream_upstream(url, etag)
             
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
-        
-        # If width or height is specified, resize the image
-        if width or height:
-            local_path = filepath
-            if local_path:
-                google_api.resize_image(
-                    image_path=local_path,
-                    width=width,
-                    height=height,
-                    maintain_aspect_ratio=maintain_aspect_ratio
-                )
+        # Reuse an earlier resize of the same image if nginx can serve it
+        if config.X_ACCEL_REDIRECT_PREFIX:
+            resized_paths = glob.glob(os.path.join(RESIZED_DIR, etag + '.*'))
+            if resized_paths:
+                return _accel_redirect(resized_paths[0], etag)
                 
-                return send_file(local_path, mimetype=f'image/{os.path.splitext(filename)[1][1:]}')
+        content = _fetch_image(url)
+        if content is None:
+            return jsonify({'error': 'Failed to download the image from URL'}), 500
+        
+        # Decode and resize the image entirely in memory
+        img = Image.open(BytesIO(content))
+        # Pillow opens many camera JPEGs as MPO, send those back as plain JPEG
+        image_format = 'JPEG' if img.format in (None, 'MPO') else img.format
+        resized_img = google_api.resize(
+            img,
+            width=width,
+            height=height,
+            maintain_aspect_ratio=maintain_aspect_ratio
+        )
+        
+        # Convert to RGB if it's RGBA mode and we're encoding as JPEG
+        if resized_img.mode == 'RGBA' and image_format == 'JPEG':
+            resized_img = resized_img.convert('RGB')
         
-        # If resize failed or wasn't requested, return original image
-        return send_file(filepath, mimetype=f'image/{os.path.splitext(filename)[1][1:]}')
+        save_options = SAVE_OPTIONS.get(image_format, {})
+        
+        # Write the result where nginx can read it, renaming it into place once complete
+        if config.X_ACCEL_REDIRECT_PREFIX:
+            os.makedirs(RESIZED_DIR, exist_ok=True)
+            resized_path = os.path.join(RESIZED_DIR, f'{etag}.{image_format.lower()}')
+            with tempfile.NamedTemporaryFile(dir=RESIZED_DIR, delete=False) as f:
+                resized_img.save(f, format=image_format, **save_options)
+            # Temporary files are private to their owner, nginx workers usually run as another user
+            os.chmod(f.name, 0o644)
+            os.replace(f.name, resized_path)
+            return _accel_redirect(resized_path, etag)
+            
+        # Small results stay in memory, only unusually large ones spill to disk
+        buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        resized_img.save(buffer, format=image_format, **save_options)
+        buffer.seek(0)
+        
+        # No Content-Length is set, so the response is sent chunked
+        resized = Response(
+            iter(lambda: buffer.read(STREAM_CHUNK_SIZE), b''),
+            mimetype=Image.MIME.get(image_format, 'application/octet-stream')
+        )
+        resized.call_on_close(buffer.close)
+        return _cacheable(resized, etag)
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up temporary directory
-        if 'temp_dir' in locals() and os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+
+
+def _remove_tree(path):
+    """
+    Delete a directory of temporary files that is no longer in use
+    """
+    try:
+        shutil.rmtree(path)
+    except Exception as e:
+        print(f"Error cleaning up temporary files: {str(e)}")
 
 
 @app.route('/cleanup', methods=['POST'])
@@ -193,16 +388,22 @@ def cleanup_temp_files():
     """
     Clean up temporary downloaded files
     
+    The temporary directory is swapped for an empty one, the old one is deleted in a
+    background thread so the request returns immediately.
+    
     Returns:
-        Success message
+        Message confirming the cleanup was scheduled
     """
     try:
-        # Remove the temporary directory
+        # Renaming is instant and leaves files still being written out of the new directory
+        trash_dir = tempfile.mkdtemp(prefix='google_images_search-trash-')
         if os.path.exists(TEMP_DIR):
-            shutil.rmtree(TEMP_DIR)
-            os.makedirs(TEMP_DIR, exist_ok=True)
-            
-        return jsonify({'message': 'Temporary files cleaned up successfully'})
+            os.rename(TEMP_DIR, os.path.join(trash_dir, 'files'))
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        
+        # A real thread, so the delete doesn't hold up the gevent event loop
+        _start_native_thread(_remove_tree, (trash_dir,))
+        return jsonify({'message': 'Temporary file cleanup scheduled'}), 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
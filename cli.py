@@ -7,7 +7,7 @@ import argparse
 import json
 import os
 import sys
-from image_search import GoogleImageAPI
+from image_search import GoogleImageAPI, to_columns
 
 
 def main():
@@ -28,8 +28,10 @@ def main():
     search_parser.add_argument('--image-size', help='Image size filter (e.g., large, medium)')
     search_parser.add_argument('--image-type', help='Image type filter (e.g., photo, clip-art)')
     search_parser.add_argument('-d', '--download', help='Directory to download images to')
+    search_parser.add_argument('--dimensions', action='store_true', help='Fetch the width, height and file size of each image')
     search_parser.add_argument('-o', '--output', help='File to save results to (JSON format)')
     search_parser.add_argument('--quiet', action='store_true', help='Only output JSON results, no additional information')
+    search_parser.add_argument('--columns', action='store_true', help='Output JSON results with one list per field')
     
     # Resize command
     resize_parser = subparsers.add_parser('resize', help='Resize an image')
@@ -82,14 +84,15 @@ def search_command(api, args):
         color_type=args.color_type,
         image_size=args.image_size,
         image_type=args.image_type,
-        download_directory=args.download
+        download_directory=args.download,
+        include_dimensions=args.dimensions
     )
     
     # Format the results
     output = {
         'query': args.query,
         'num_results': len(results),
-        'results': results
+        'results': to_columns(results) if args.columns else results
     }
     
     # Output the results
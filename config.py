@@ -4,6 +4,11 @@ Configuration file for Google Images Search API
 This module reads configuration from environment variables:
 - GOOGLE_API_KEY: Your Google API developer key
 - GOOGLE_CSE_ID: Your Custom Search Engine ID
+- REDIS_URL: Optional Redis connection URL used to cache search results
+- SEARCH_CACHE_TTL: Seconds to keep cached search results (default: 3600)
+- IMAGE_CACHE_TTL: Seconds to keep cached downloaded images (default: 1800)
+- IMAGE_CACHE_MAX_BYTES: Largest downloaded image that is cached (default: 2000000)
+- X_ACCEL_REDIRECT_PREFIX: Optional nginx internal location serving the temporary directory
 
 If environment variables are not set, fallback to default values.
 """
@@ -17,3 +22,20 @@ DEVELOPER_KEY = os.environ.get("GOOGLE_API_KEY", "")
 # Read Google Custom Search Engine ID from environment variables
 # Get it from: https://cse.google.com/cse/all
 CX = os.environ.get("GOOGLE_CSE_ID", "")
+
+# Read Redis connection URL from environment variables
+# Caching is disabled when it is not set, e.g. redis://localhost:6379/0
+REDIS_URL = os.environ.get("REDIS_URL", "")
+
+# Number of seconds search results are kept in the cache
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 3600))
+
+# Number of seconds downloaded images are kept in the cache
+IMAGE_CACHE_TTL = int(os.environ.get("IMAGE_CACHE_TTL", 1800))
+
+# Downloaded images larger than this many bytes are never cached
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 2000000))
+
+# Read the nginx internal location that maps to the temporary directory
+# When set, resized images are handed to nginx with X-Accel-Redirect, e.g. /internal/
+X_ACCEL_REDIRECT_PREFIX = os.environ.get("X_ACCEL_REDIRECT_PREFIX", "")
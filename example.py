@@ -22,7 +22,8 @@ def basic_search_example():
     results = api.search(
         query="beautiful landscapes",
         num_images=3,
-        safe_search=True
+        safe_search=True,
+        include_dimensions=True
     )
     
     # Print results
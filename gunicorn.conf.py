@@ -0,0 +1,17 @@
+"""
+Gunicorn configuration for the Google Image Search API
+
+Both /search and /download spend most of their time waiting on Google and
+image hosts, so gevent workers are used to multiplex many requests per process.
+"""
+
+import multiprocessing
+import os
+
+# Listen on the port provided by Railway
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+# Cooperative workers for the I/O-bound endpoints
+worker_class = 'gevent'
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2))
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
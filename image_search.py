@@ -3,57 +3,449 @@ Google Image Search API Implementation
 """
 
 from google_images_search import GoogleImagesSearch
+from googleapiclient import discovery
 from io import BytesIO
 from PIL import Image
+import functools
+import hashlib
+import httpx
+import json
 import os
+import redis
 import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Union, Tuple
 import config
 
+# Maximum number of concurrent requests to image hosts made by a single search,
+# enough to cover the size, dimension and download requests for a full page of results
+SEARCH_WORKERS = 32
+
+# Number of probed image dimensions remembered per GoogleImageAPI instance
+DIMENSION_CACHE_SIZE = 4096
+
+# aria2c binary used for bulk downloads, searches fall back to Python downloads without it
+ARIA2C = shutil.which('aria2c')
+
+# Number of parallel aria2c downloads
+BULK_DOWNLOAD_JOBS = 16
+
+# Bytes read from the start of an image to find its dimensions. Wider than the few bytes
+# most headers need because JPEGs can carry large EXIF/ICC segments before the frame header
+SNIFF_BYTES = 64 * 1024
+
+# Headers for dimension probes: ask for only the start of the image, uncompressed
+PROBE_HEADERS = {'Range': f'bytes=0-{SNIFF_BYTES - 1}', 'Accept-Encoding': 'identity'}
+
+# Encoder settings for resized images, favouring encode speed over file size
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': False, 'progressive': False, 'subsampling': 2},
+    'PNG': {'compress_level': 1},
+}
+
+
+def to_columns(results: List[Dict]) -> Dict[str, List]:
+    """
+    Convert search results to a column-oriented layout
+    
+    Args:
+        results (List[Dict]): Results as returned by GoogleImageAPI.search
+        
+    Returns:
+        Dict[str, List]: One list per field, holding None where a result lacks that field
+    """
+    fields = dict.fromkeys(field for result in results for field in result)
+    return {field: [result.get(field) for result in results] for field in fields}
+
+
+def _download_file_name(url: str, index: int, custom_file_names: List[str] = None) -> str:
+    """
+    Pick the file name a search result is downloaded to.
+    
+    Args:
+        url (str): The URL of the image
+        index (int): Position of the image in the search results
+        custom_file_names (List[str], optional): Custom file names for downloaded images
+        
+    Returns:
+        str: File name for the image
+    """
+    basename = _url_basename(url)
+    
+    # Set custom filename if provided
+    if custom_file_names and index < len(custom_file_names):
+        # Extract extension from the URL
+        dot = basename.rfind('.')
+        extension = basename[dot:] if dot > 0 else '.jpg'  # Default to jpg if no extension found
+        return custom_file_names[index] + extension
+    
+    # Generate a filename based on index if none provided
+    return basename if basename else f'image_{index}.jpg'
+
+
+def _url_basename(url: str) -> str:
+    """
+    Get the last path segment of a URL, ignoring any query string
+    
+    Args:
+        url (str): The URL
+        
+    Returns:
+        str: The file name part of the URL, which may be empty
+    """
+    return url.split('?', 1)[0].rsplit('/', 1)[-1]
+
+
+# JPEG start-of-frame markers, which carry the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _sniff_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read image dimensions straight from the header of a JPEG, PNG, GIF, WebP or BMP file
+    
+    Args:
+        data (bytes): The beginning of the image file
+        
+    Returns:
+        Optional[Tuple[int, int]]: Width and height, or None if more data is needed
+        
+    Raises:
+        ValueError: If the data is not in one of the supported formats
+    """
+    if len(data) < 12:
+        return None
+        
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        # The IHDR chunk always comes first
+        return struct.unpack('>II', data[16:24]) if len(data) >= 24 else None
+        
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return struct.unpack('<HH', data[6:10])
+        
+    if data.startswith(b'BM'):
+        if len(data) < 26:
+            return None
+        if struct.unpack('<I', data[14:18])[0] == 12:
+            return struct.unpack('<HH', data[18:22])
+        width, height = struct.unpack('<ii', data[18:26])
+        return width, abs(height)
+        
+    if data.startswith(b'RIFF') and data[8:12] == b'WEBP':
+        if len(data) < 30:
+            return None
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = struct.unpack('<I', data[21:25])[0]
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return (int.from_bytes(data[24:27], 'little') + 1,
+                    int.from_bytes(data[27:30], 'little') + 1)
+        raise ValueError('Unsupported WebP chunk')
+        
+    if data.startswith(b'\xff\xd8'):
+        # Walk the marker segments until the start-of-frame header
+        offset = 2
+        while offset + 4 <= len(data):
+            if data[offset] != 0xFF:
+                raise ValueError('Invalid JPEG marker')
+            marker = data[offset + 1]
+            if marker == 0xFF:
+                # Fill byte before the actual marker
+                offset += 1
+                continue
+            if marker in _JPEG_SOF_MARKERS:
+                if offset + 9 > len(data):
+                    return None
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height
+            if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+                # Standalone markers have no length field
+                offset += 2
+                continue
+            offset += 2 + struct.unpack('>H', data[offset + 2:offset + 4])[0]
+        return None
+        
+    raise ValueError('Unsupported image format')
+
+
+def _response_file_size(response) -> int:
+    """
+    Get the full size of the file behind a possibly partial response
+    
+    Args:
+        response: The response to a GET request
+        
+    Returns:
+        int: Size of the file in bytes, or 0 if the server does not report it
+    """
+    if response.status_code == 206:
+        # Content-Range: bytes <first>-<last>/<total>, the total may be '*'
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        return int(total) if total.isdigit() else 0
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        # Compressed length, not the size of the file
+        return 0
+    return int(response.headers.get('Content-Length', 0))
+
 
 class GoogleImageAPI:
     """Google Image Search API wrapper class"""
 
-    def _get_image_dimensions_from_url(self, url: str) -> Tuple[int, int]:
+    def _get_image_dimensions_from_url(self, url: str) -> Tuple[int, int, int]:
         """
         Get the dimensions of an image from its URL without downloading the entire image.
         
+        Results are cached per URL, failed lookups are retried on the next call.
+        
         Args:
             url (str): The URL of the image
             
         Returns:
-            Tuple[int, int]: Width and height of the image, or None if it cannot be determined
+            Tuple[int, int, int]: Width and height of the image and its size in bytes (0 if the server
+                does not report it), or None if the dimensions cannot be determined
         """
         try:
-            import requests
-            from PIL import Image
-            from io import BytesIO
+            return self._probe_dimensions_cached(url)
+        except LookupError:
+            return None
+        except Exception as e:
+            print(f"Error getting image dimensions: {str(e)}")
+            return None
+
+    def _probe_dimensions(self, url: str) -> Tuple[int, int, int]:
+        """
+        Stream the beginning of an image to read its dimensions.
+        
+        Args:
+            url (str): The URL of the image
+            
+        Returns:
+            Tuple[int, int, int]: Width and height of the image and its size in bytes, 0 if not reported
             
-            # Make a HEAD request first to check content type
-            head_response = requests.head(url, timeout=5)
-            if not head_response.headers.get('content-type', '').startswith('image'):
-                return None
+        Raises:
+            LookupError: If the dimensions cannot be determined
+        """
+        # Stream just enough of the image to get dimensions
+        with self.session.stream('GET', url, headers=PROBE_HEADERS, timeout=5) as response:
+            # Servers that ignore the range answer 200 with the full body, which is read only as far as needed
+            if response.status_code not in (200, 206):
+                raise LookupError(f"Unexpected status {response.status_code}: {url}")
+            # Check the content type before reading any of the body
+            if not response.headers.get('content-type', '').startswith('image'):
+                raise LookupError(f"Not an image: {url}")
                 
-            # Stream just enough of the image to get dimensions
-            response = requests.get(url, stream=True, timeout=5)
-            content = BytesIO()
+            # The response headers also tell the file size, saving a HEAD request
+            file_size = _response_file_size(response)
+            content = bytearray()
+            sniff = True
             
             # Get just the beginning of the file
-            for chunk in response.iter_content(chunk_size=1024):
-                content.write(chunk)
+            for chunk in response.iter_bytes(chunk_size=1024):
+                content += chunk
+                if sniff:
+                    try:
+                        dimensions = _sniff_dimensions(content)
+                    except ValueError:
+                        # Not a format we can parse by hand, let PIL try instead
+                        sniff = False
+                    else:
+                        if dimensions:
+                            return dimensions + (file_size,)
+                        # Not enough data yet, continue downloading
+                        continue
                 try:
-                    img = Image.open(content)
-                    return img.size  # (width, height)
+                    img = Image.open(BytesIO(content))
+                    return img.size + (file_size,)  # (width, height, file size)
                 except Exception:
                     # Not enough data yet, continue downloading
                     continue
                     
-            # If we get here, we couldn't determine the size
+        # If we get here, we couldn't determine the size
+        raise LookupError(f"Could not determine the dimensions of {url}")
+
+    def _get_image_info_from_url(self, url: str) -> Tuple[Optional[Tuple[int, int]], int]:
+        """
+        Get the dimensions and size of an image from its URL.
+        
+        The size comes from the dimension probe, with a HEAD request only when the probe fails
+        or the server does not report it.
+        
+        Args:
+            url (str): The URL of the image
+            
+        Returns:
+            Tuple[Optional[Tuple[int, int]], int]: Width and height of the image, or None if they
+                cannot be determined, and its size in bytes, or 0 if unknown
+        """
+        probed = self._get_image_dimensions_from_url(url)
+        dimensions = probed[:2] if probed else None
+        if probed and probed[2]:
+            return dimensions, probed[2]
+        return dimensions, self._get_file_size_from_url(url)
+
+    def _get_image_dimensions_from_file(self, path: str) -> Tuple[int, int]:
+        """
+        Get the dimensions of a downloaded image from its header.
+        
+        Args:
+            path (str): Path to the image
+            
+        Returns:
+            Tuple[int, int]: Width and height of the image, or None if it cannot be determined
+        """
+        try:
+            with open(path, 'rb') as f:
+                dimensions = _sniff_dimensions(f.read(SNIFF_BYTES))
+            if dimensions:
+                return dimensions
+        except ValueError:
+            # Not a format we can parse by hand, let PIL try instead
+            pass
+        except Exception:
             return None
             
+        try:
+            with Image.open(path) as img:
+                return img.size
+        except Exception:
+            return None
+
+    def _get_file_size_from_url(self, url: str) -> int:
+        """
+        Get the size of an image from its URL with a HEAD request.
+        
+        Args:
+            url (str): The URL of the image
+            
+        Returns:
+            int: Size of the image in bytes, or 0 if the server does not report it
+        """
+        try:
+            response = self.session.head(url, timeout=3)
+            if response.status_code != 200:
+                return 0
+            return int(response.headers.get('Content-Length', 0))
         except Exception as e:
-            print(f"Error getting image dimensions: {str(e)}")
+            print(f"Error getting image file size: {str(e)}")
+            return 0
+
+    def _download_image(self,
+                        image,
+                        index: int,
+                        download_directory: str,
+                        custom_file_names: List[str] = None) -> Optional[str]:
+        """
+        Download a single search result into a directory.
+        
+        Args:
+            image: The GSImage search result to download
+            index (int): Position of the image in the search results
+            download_directory (str): Directory to download the image to
+            custom_file_names (List[str], optional): Custom file names for downloaded images
+            
+        Returns:
+            Optional[str]: Path to the downloaded image, or None if the download failed
+        """
+        filename = _download_file_name(image.url, index, custom_file_names)
+        
+        # The GSImage download method doesn't support custom filenames
+        # We need to download it first and then rename it
+        try:
+            # Download the image with default name
+            image.download(download_directory)
+            
+            # Get the downloaded path
+            downloaded_path = image.path
+            
+            # If the download worked and we want a custom filename
+            if downloaded_path and os.path.exists(downloaded_path):
+                # Rename to our desired filename
+                new_path = os.path.join(download_directory, filename)
+                if downloaded_path != new_path:
+                    os.replace(downloaded_path, new_path)
+                    filepath = new_path
+                else:
+                    filepath = downloaded_path
+            else:
+                # Use manual download if we couldn't get the file
+                filepath = os.path.join(download_directory, filename)
+                with self.session.stream('GET', image.url, timeout=10) as response:
+                    if response.status_code != 200:
+                        return None
+                    # httpx has no raw file object to copy from, so hand the decoded
+                    # 64 KiB chunks straight to writelines() instead
+                    with open(filepath, 'wb') as f:
+                        f.writelines(response.iter_bytes(chunk_size=64 * 1024))
+        except Exception as e:
+            print(f"Error downloading image: {str(e)}")
             return None
+        return filepath if os.path.exists(filepath) else None
+
+    def _bulk_download(self, urls: List[str], names: List[str], directory: str) -> List[Optional[str]]:
+        """
+        Download several images at once with aria2c.
+        
+        Args:
+            urls (List[str]): The URLs of the images
+            names (List[str]): File names to save the images under
+            directory (str): Directory to download the images to
+            
+        Returns:
+            List[Optional[str]]: Path to each downloaded image, or None for images that were not
+                downloaded, which is all of them when aria2c is not installed
+        """
+        if not ARIA2C or not urls:
+            return [None] * len(urls)
+        
+        # Download into a fresh directory so nothing left from an earlier search passes for
+        # a new download, naming files by index and moving them into place once complete
+        work_dir = tempfile.mkdtemp(prefix='.aria2-', dir=directory)
+        try:
+            # aria2c reads the URLs and their output names from an input file
+            input_path = os.path.join(work_dir, 'input.txt')
+            with open(input_path, 'w') as f:
+                for i, url in enumerate(urls):
+                    f.write(f"{url}\n  out={i}\n")
+                    
+            # Downloads that fail or don't finish are written to the session file on exit
+            session_path = os.path.join(work_dir, 'session.txt')
+            try:
+                result = subprocess.run([ARIA2C, '-i', input_path, '-j', str(BULK_DOWNLOAD_JOBS), '--dir', work_dir,
+                                         '--save-session', session_path, '--max-connection-per-server=4',
+                                         '--timeout=10', '--quiet'], timeout=60)
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"Error running aria2c: {str(e)}")
+                return [None] * len(urls)
+                
+            failed = set()
+            if result.returncode != 0:
+                try:
+                    with open(session_path) as f:
+                        failed = {line.strip()[4:] for line in f if line.strip().startswith('out=')}
+                except OSError:
+                    # No record of which downloads failed, so trust none of them
+                    return [None] * len(urls)
+                    
+            paths = []
+            for i, name in enumerate(names):
+                downloaded_path = os.path.join(work_dir, str(i))
+                if str(i) in failed or not os.path.exists(downloaded_path):
+                    paths.append(None)
+                    continue
+                path = os.path.join(directory, name)
+                os.replace(downloaded_path, path)
+                paths.append(path)
+            return paths
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
     def __init__(self, developer_key: str = None, cx: str = None):
         """
@@ -66,6 +458,72 @@ class GoogleImageAPI:
         self.developer_key = developer_key or config.DEVELOPER_KEY
         self.cx = cx or config.CX
         self.gis = GoogleImagesSearch(self.developer_key, self.cx)
+        # GoogleImagesSearch keeps each search's state on the instance and shares one httplib2
+        # client, so concurrent requests (gevent workers serve many at once) take turns with it
+        self._gis_lock = threading.Lock()
+        self.cache = redis.Redis.from_url(config.REDIS_URL, socket_timeout=1) if config.REDIS_URL else None
+        
+        # Image URLs rarely change what they point to, so probed dimensions are kept in memory
+        self._probe_dimensions_cached = functools.lru_cache(maxsize=DIMENSION_CACHE_SIZE)(self._probe_dimensions)
+        
+        # Shared HTTP client so connections to image hosts are kept alive and reused,
+        # hosts that speak HTTP/2 multiplex concurrent requests over a single connection
+        self.session = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=2,
+                limits=httpx.Limits(max_connections=128, max_keepalive_connections=32)
+            ),
+            follow_redirects=True,
+            timeout=10.0
+        )
+        
+    def warm_up(self):
+        """
+        Build the Custom Search API client ahead of the first search
+        
+        google_images_search builds it lazily on the first query and reuses it afterwards,
+        so doing it here keeps that cost out of the first request.
+        """
+        search_client = self.gis._google_custom_search
+        with self._gis_lock:
+            if search_client._google_build is None:
+                search_client._google_build = discovery.build(
+                    'customsearch', 'v1', developerKey=self.developer_key, cache_discovery=False)
+        
+    def get_cached(self, key: str) -> Optional[bytes]:
+        """
+        Get a value from the Redis cache
+        
+        Args:
+            key (str): Cache key
+            
+        Returns:
+            Optional[bytes]: The cached value, or None on a miss or if caching is disabled
+        """
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(key)
+        except redis.RedisError as e:
+            print(f"Error reading from cache: {str(e)}")
+            return None
+    
+    def set_cached(self, key: str, value: Union[str, bytes], ttl: int):
+        """
+        Store a value in the Redis cache
+        
+        Args:
+            key (str): Cache key
+            value (Union[str, bytes]): Value to store
+            ttl (int): Number of seconds to keep the value
+        """
+        if self.cache is None:
+            return
+        try:
+            self.cache.setex(key, ttl, value)
+        except redis.RedisError as e:
+            print(f"Error writing to cache: {str(e)}")
         
     def search(self, 
                query: str, 
@@ -76,7 +534,8 @@ class GoogleImageAPI:
                image_size: str = None,
                image_type: str = None,
                download_directory: str = None,
-               custom_file_names: List[str] = None) -> List[Dict]:
+               custom_file_names: List[str] = None,
+               include_dimensions: bool = False) -> List[Dict]:
         """
         Search for images using Google Images Search API
         
@@ -90,6 +549,9 @@ class GoogleImageAPI:
             image_type (str, optional): Image type (photo, clip-art, etc.)
             download_directory (str, optional): Directory to download images to.
             custom_file_names (List[str], optional): Custom file names for downloaded images.
+            include_dimensions (bool, optional): Whether to fetch the beginning of each image to report its
+                width, height and file size. Defaults to False, leaving them 0 so that no request is made
+                per image. Downloaded images are always measured.
             
         Returns:
             List[Dict]: List of dictionaries containing image details
@@ -111,107 +573,106 @@ class GoogleImageAPI:
         if image_type:
             search_params['imgType'] = image_type
             
+        # Results are only cached when nothing has to be written to disk
+        cache_key = None
+        if not download_directory:
+            cache_params = dict(search_params, include_dimensions=include_dimensions)
+            cache_key = 'gis:' + hashlib.sha1(json.dumps(cache_params, sort_keys=True).encode()).hexdigest()
+            cached = self.get_cached(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+            
         # Search for images
-        self.gis.search(search_params=search_params)
+        with self._gis_lock:
+            self.gis.search(search_params=search_params)
+            images = list(self.gis.results())
         
-        # Process results
-        results = []
-        for i, image in enumerate(self.gis.results()):
-            # The results are GSImage objects with limited attributes
-            # We need to extract what we can, default the rest
-            
-            # Use BytesIO to get image dimensions without saving to disk
-            image_dimensions = self._get_image_dimensions_from_url(image.url)
+        if download_directory:
+            os.makedirs(download_directory, exist_ok=True)
             
-            image_data = {
-                'url': image.url,
-                'referrer_url': image.referrer_url,
-                'width': image_dimensions[0] if image_dimensions else 0,
-                'height': image_dimensions[1] if image_dimensions else 0,
-                'file_name': os.path.basename(image.url.split('?')[0]),
-                'file_size': 0  # We can't get this without downloading
-            }
-            
-            # Download the image if a directory is specified
+        
+        # Results are filled in by index; skipped images stay None and are dropped at the end
+        results = [None] * len(images)
+        # Threads are only started as work is submitted, so small searches stay cheap
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+            # Download every image up front, in bulk through aria2c when available and in
+            # overlapping Python downloads for the rest, otherwise probe dimensions by
+            # streaming just enough of each image if asked to
             if download_directory:
-                os.makedirs(download_directory, exist_ok=True)
+                names = [_download_file_name(image.url, i, custom_file_names) for i, image in enumerate(images)]
+                local_paths = self._bulk_download([image.url for image in images], names, download_directory)
+                downloads = [executor.submit(self._download_image, image, i, download_directory, custom_file_names)
+                             if local_paths[i] is None else None
+                             for i, image in enumerate(images)]
+            elif include_dimensions:
+                probes = [executor.submit(self._get_image_info_from_url, image.url) for image in images]
+                
+            # Process results
+            for i, image in enumerate(images):
+                # The results are GSImage objects with limited attributes
+                # We need to extract what we can, default the rest
                 
-                # Set custom filename if provided
-                if custom_file_names and i < len(custom_file_names):
-                    # Extract extension from the URL
-                    img_url = image.url
-                    extension = os.path.splitext(os.path.basename(img_url.split('?')[0]))[1]
-                    if not extension:
-                        extension = '.jpg'  # Default to jpg if no extension found
-                    filename = custom_file_names[i] + extension
+                if download_directory:
+                    # Downloaded images are measured on disk instead of being requested again
+                    local_path = local_paths[i] or downloads[i].result()
+                    if local_path is None:
+                        continue
+                    image_dimensions = self._get_image_dimensions_from_file(local_path)
+                    file_size = os.path.getsize(local_path)
+                elif include_dimensions:
+                    image_dimensions, file_size = probes[i].result()
                 else:
-                    # Generate a filename based on index if none provided
-                    img_url = image.url
-                    basename = os.path.basename(img_url.split('?')[0])
-                    filename = basename if basename else f'image_{i}.jpg'
+                    # Only the search itself was requested, nothing is fetched per image
+                    image_dimensions = None
+                    file_size = 0
                 
-                # The GSImage download method doesn't support custom filenames
-                # We need to download it first and then rename it
-                try:
-                    # Download the image with default name
-                    image.download(download_directory)
-                    
-                    # Get the downloaded path
-                    downloaded_path = image.path
-                    
-                    # If the download worked and we want a custom filename
-                    if downloaded_path and os.path.exists(downloaded_path):
-                        # Rename to our desired filename
-                        new_path = os.path.join(download_directory, filename)
-                        if downloaded_path != new_path:
-                            shutil.move(downloaded_path, new_path)
-                            filepath = new_path
-                        else:
-                            filepath = downloaded_path
-                    else:
-                        # Use manual download if we couldn't get the file
-                        filepath = os.path.join(download_directory, filename)
-                        import requests
-                        response = requests.get(image.url, stream=True)
-                        if response.status_code == 200:
-                            with open(filepath, 'wb') as f:
-                                for chunk in response.iter_content(1024):
-                                    f.write(chunk)
-                except Exception as e:
-                    print(f"Error downloading image: {str(e)}")
-                    continue
-                image_data['local_path'] = os.path.join(download_directory, filename)
+                image_data = {
+                    'url': image.url,
+                    'referrer_url': image.referrer_url,
+                    'width': image_dimensions[0] if image_dimensions else 0,
+                    'height': image_dimensions[1] if image_dimensions else 0,
+                    'file_name': _url_basename(image.url),
+                    'file_size': file_size
+                }
+                
+                if download_directory:
+                    image_data['local_path'] = local_path
                 
-            results.append(image_data)
+                results[i] = image_data
+                
+        results = [result for result in results if result is not None]
+            
+        if cache_key:
+            self.set_cached(cache_key, json.dumps(results), config.SEARCH_CACHE_TTL)
             
         return results
     
-    def resize_image(self, 
-                    image_path: str, 
-                    output_path: str = None, 
-                    width: int = None, 
-                    height: int = None,
-                    maintain_aspect_ratio: bool = True) -> str:
+    def resize(self,
+               img: Image.Image,
+               width: int = None,
+               height: int = None,
+               maintain_aspect_ratio: bool = True,
+               resample: int = None) -> Image.Image:
         """
-        Resize an image
+        Resize an opened image
+        
+        Downscaling while maintaining the aspect ratio modifies the image passed in and returns it,
+        other resizes return a new image and leave it untouched.
         
         Args:
-            image_path (str): Path to the image
-            output_path (str, optional): Path to save the resized image. Defaults to overwriting original.
+            img (Image.Image): The image to resize
             width (int, optional): Target width
             height (int, optional): Target height
             maintain_aspect_ratio (bool, optional): Whether to maintain aspect ratio. Defaults to True.
+            resample (int, optional): Resampling filter. Defaults to BILINEAR for targets up to
+                512px and LANCZOS for larger ones.
             
         Returns:
-            str: Path to the resized image
+            Image.Image: The resized image
         """
         if not width and not height:
             raise ValueError("At least one of width or height must be specified")
             
-        if not output_path:
-            output_path = image_path
-            
-        img = Image.open(image_path)
         original_width, original_height = img.size
         
         if maintain_aspect_ratio:
@@ -241,14 +702,63 @@ class GoogleImageAPI:
             new_width = width or original_width
             new_height = height or original_height
             
-        # Resize the image
-        resized_img = img.resize((new_width, new_height), Image.LANCZOS)
+        if resample is None:
+            # Bilinear is indistinguishable from Lanczos at thumbnail sizes and for large
+            # reductions, where the draft decode below already did most of the downscaling
+            downscale_ratio = min(original_width / new_width, original_height / new_height)
+            if max(new_width, new_height) <= 512 or downscale_ratio > 4:
+                resample = Image.BILINEAR
+            else:
+                resample = Image.LANCZOS
+            
+        # Downscaling into a bounding box: thumbnail() fits the image inside the box, drafting JPEGs
+        # itself. It still resamples into a new buffer before swapping it in, so peak memory is the
+        # same as with resize()
+        if maintain_aspect_ratio and new_width <= original_width and new_height <= original_height:
+            img.thumbnail((width or original_width, height or original_height), resample, reducing_gap=3.0)
+            return img
+            
+        # Let libjpeg decode at a reduced DCT scale, keeping twice the target size for quality
+        if img.format in ('JPEG', 'MPO') and new_width < original_width and new_height < original_height:
+            img.draft(None, (new_width * 2, new_height * 2))
+            
+        # Resize the image, reducing by whole factors first when shrinking by more than 3x
+        return img.resize((new_width, new_height), resample, reducing_gap=3.0)
+    
+    def resize_image(self, 
+                    image_path: str, 
+                    output_path: str = None, 
+                    width: int = None, 
+                    height: int = None,
+                    maintain_aspect_ratio: bool = True) -> str:
+        """
+        Resize an image
+        
+        Args:
+            image_path (str): Path to the image
+            output_path (str, optional): Path to save the resized image. Defaults to overwriting original.
+            width (int, optional): Target width
+            height (int, optional): Target height
+            maintain_aspect_ratio (bool, optional): Whether to maintain aspect ratio. Defaults to True.
+            
+        Returns:
+            str: Path to the resized image
+        """
+        if not width and not height:
+            raise ValueError("At least one of width or height must be specified")
+            
+        if not output_path:
+            output_path = image_path
+            
+        img = Image.open(image_path)
+        resized_img = self.resize(img, width, height, maintain_aspect_ratio)
         
         # Convert to RGB if it's RGBA mode and we're saving as JPEG
         if resized_img.mode == 'RGBA' and output_path.lower().endswith(('.jpg', '.jpeg')):
             resized_img = resized_img.convert('RGB')
         
-        resized_img.save(output_path)
+        image_format = Image.registered_extensions().get(os.path.splitext(output_path)[1].lower())
+        resized_img.save(output_path, **SAVE_OPTIONS.get(image_format, {}))
         
         return output_path
 
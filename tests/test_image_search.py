@@ -0,0 +1,104 @@
+"""
+Tests for the header parsing helpers in image_search
+"""
+
+import struct
+from io import BytesIO
+
+import httpx
+import pytest
+from PIL import Image
+
+from image_search import _response_file_size, _sniff_dimensions
+
+
+def encode(size, image_format, mode='RGB', **options):
+    """
+    Encode a blank image of the given size
+    """
+    buffer = BytesIO()
+    Image.new(mode, size).save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def exif_block(length):
+    """
+    Build an EXIF block of roughly the given length
+    """
+    exif = Image.Exif()
+    exif[0x010E] = 'x' * length  # ImageDescription
+    return exif.tobytes()
+
+
+SAMPLES = {
+    'png': encode((321, 123), 'PNG'),
+    'gif': encode((321, 123), 'GIF'),
+    'bmp': encode((321, 123), 'BMP'),
+    'webp_lossy': encode((321, 123), 'WEBP'),
+    'webp_lossless': encode((321, 123), 'WEBP', lossless=True),
+    'webp_extended': encode((321, 123), 'WEBP', mode='RGBA'),
+    'jpeg_baseline': encode((321, 123), 'JPEG'),
+    'jpeg_progressive': encode((321, 123), 'JPEG', progressive=True),
+    'jpeg_exif': encode((321, 123), 'JPEG', exif=exif_block(20000)),
+}
+
+# A top-down BMP stores a negative height in its header
+SAMPLES['bmp_top_down'] = SAMPLES['bmp'][:22] + struct.pack('<i', -123) + SAMPLES['bmp'][26:]
+
+
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+def test_sniff_dimensions(name):
+    assert _sniff_dimensions(SAMPLES[name]) == (321, 123)
+
+
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+def test_sniff_dimensions_truncated(name):
+    # Cut every sample off before its dimensions
+    cutoff = {'jpeg_exif': 20000}.get(name, 11 if name == 'gif' else 20)
+    assert _sniff_dimensions(SAMPLES[name][:cutoff]) is None
+
+
+def test_sniff_dimensions_webp_extended_needs_header():
+    assert _sniff_dimensions(SAMPLES['webp_extended'][:29]) is None
+
+
+def test_sniff_dimensions_bmp_core_header():
+    # OS/2 bitmaps use a 12 byte header with 16 bit dimensions
+    header = b'BM' + b'\0' * 12 + struct.pack('<IHHHH', 12, 321, 123, 1, 24)
+    assert _sniff_dimensions(header + b'\0' * 8) == (321, 123)
+
+
+def test_sniff_dimensions_jpeg_markers():
+    # SOI, a standalone TEM marker, fill bytes, then a baseline start-of-frame
+    sof = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, 123, 321, 1) + b'\x01\x11\x00'
+    data = b'\xff\xd8' + b'\xff\x01' + b'\xff\xff\xff' + sof
+    assert _sniff_dimensions(data) == (321, 123)
+    assert _sniff_dimensions(data[:-8]) is None
+
+
+def test_sniff_dimensions_jpeg_invalid_marker():
+    with pytest.raises(ValueError):
+        _sniff_dimensions(b'\xff\xd8\x00\x00' + b'\0' * 16)
+
+
+@pytest.mark.parametrize('data', [
+    b'not an image at all',
+    encode((321, 123), 'TIFF'),
+    b'RIFF\0\0\0\0WEBPALPH' + b'\0' * 20,
+])
+def test_sniff_dimensions_unsupported(data):
+    with pytest.raises(ValueError):
+        _sniff_dimensions(data)
+
+
+@pytest.mark.parametrize('status, headers, size', [
+    (200, {'Content-Length': '4096'}, 4096),
+    (200, {}, 0),
+    (200, {'Content-Length': '1024', 'Content-Encoding': 'gzip'}, 0),
+    (200, {'Content-Length': '4096', 'Content-Encoding': 'identity'}, 4096),
+    (206, {'Content-Range': 'bytes 0-65535/123456', 'Content-Length': '65536'}, 123456),
+    (206, {'Content-Range': 'bytes 0-65535/*', 'Content-Length': '65536'}, 0),
+    (206, {}, 0),
+])
+def test_response_file_size(status, headers, size):
+    assert _response_file_size(httpx.Response(status, headers=headers)) == size